@@ -2,10 +2,12 @@ import logging
 import numpy as np
 from abc import ABCMeta, abstractmethod
 
+import kernels
+
 class Agent(object):
     __metaclass__ = ABCMeta
 
-    def __init__(self, id, level):
+    def __init__(self, id, level, seed=None):
         '''
         The agent is responsible for selecting actions and accepting rewards from the game
 
@@ -15,12 +17,17 @@ class Agent(object):
             The id of the particular player
         level : int
             The starting level of the player
+        seed : int
+            The seed for the agent's own random number generator (optional)
         '''
         self.id = id
         self.level = level
+        self.rng = np.random.default_rng(seed)
         self.last_action = None
         self.last_state = None
         self.last_reward = None
+        self._other_ids = None
+        self._rotations = {}
 
     def rotate_levels(self, levels, n):
         """
@@ -30,30 +37,53 @@ class Agent(object):
 
         Parameters
         ----------
-        levels : list(int)
+        levels : np.ndarray(int)
             The levels of all players by original index
         n : int
             The index to shift by, can be positive or negative
 
         Returns
         -------
-        A rotated list of levels with index n at index 0
+        A rotated array of levels with index n at index 0
+        """
+        # The rotated indices only depend on the number of players and the shift, so compute them once
+        key = (len(levels), n)
+        if key not in self._rotations:
+            self._rotations[key] = (np.arange(len(levels)) + n) % len(levels)
+        return np.asarray(levels)[self._rotations[key]]
+
+    def other_ids(self, num_players):
+        """
+        The ids of every player besides this agent, cached since the number of players stays fixed
+
+        Parameters
+        ----------
+        num_players : int
+            The number of players in the game
+
+        Returns
+        -------
+        An array of all player ids in increasing order with this agent's id left out
         """
-        return levels[n:] + levels[:n]
+        if self._other_ids is None or self._other_ids.size != num_players - 1:
+            self._other_ids = np.delete(np.arange(num_players), self.id)
+        return self._other_ids
 
     @abstractmethod
-    def pick_friends(self, levels, cap, skill_levels=None):
+    def pick_friends(self, levels, cap, skill_levels=None, skill_order=None):
         '''
         The player picks the friend(s) to be on the kingship with him/her
 
         Parameters
         ----------
-        levels : list(int)
-            The levels of all players
+        levels : np.ndarray(int)
+            The levels of all players, which the game keeps updating in place, so copy them if they are kept
         cap : int
             The max level cap
         skill_levels: list(int)
             The skill levels of all players (optional)
+        skill_order : np.ndarray(int)
+            The ids of all players from most to least skilled, precomputed when skill levels are fixed (optional)
 
         Returns
         -------
@@ -71,7 +101,7 @@ class Agent(object):
         ----------
         king : int
             The index of the king who has chosen them as a friend
-        levels : list(int)
+        levels : np.ndarray(int)
             The levels of all players
         cap : int
             The max level cap
@@ -96,6 +126,10 @@ class Agent(object):
             The reward that comes about from the agent's action
         done : bool
             Whether the game is now over or not
+        levels : np.ndarray(int)
+            A copy of the levels of all players after the action, given while the game is not over
+        cap : int
+            The max level cap, given while the game is not over
         '''
         pass
 
@@ -103,9 +137,10 @@ class Agent(object):
         return f'ID {self.id}, {self.__class__.__name__}, Level {self.level}'
 
 class Basic_Agent(Agent):
-    def pick_friends(self, levels, cap, skill_levels=None):
+    def pick_friends(self, levels, cap, skill_levels=None, skill_order=None):
         # Randomly pick an agent that is not itself (excluded when sampling)
-        return (np.random.randint(1, len(levels)) + self.id) % len(levels)
+        num_players = len(levels)
+        return (self.rng.integers(1, num_players) + self.id) % num_players
 
     def accept_reward(self, reward, done=False, levels=None, cap=None):
         pass
@@ -114,22 +149,9 @@ class Basic_Agent(Agent):
         return False
 
 class Lowest_Level_Agent(Agent):
-    def pick_friends(self, levels, cap, skill_levels=None):
-        # Pick the agent besides itself that has the lowest level
-        candidates = list(zip([i for i in range(len(levels))], levels))
-        candidates.pop(self.id)
-
-        candidates = sorted(candidates, key=lambda t: t[1])
-
-        lowest = []
-        i = 0
-        while candidates[i][1] == candidates[i-1][1] or i == 0:
-            lowest.append(candidates[i][0])
-            i += 1
-            if i == len(candidates):
-                break
-
-        return np.random.choice(lowest, size=1)[0]
+    def pick_friends(self, levels, cap, skill_levels=None, skill_order=None):
+        # Pick the agent besides itself that has the lowest level, breaking ties uniformly at random
+        return int(kernels.lowest_pick(levels, self.other_ids(len(levels)), self.rng.random()))
 
     def accept_reward(self, reward, done=False, levels=None, cap=None):
         pass
@@ -139,29 +161,20 @@ class Lowest_Level_Agent(Agent):
 
 
 class Strategic_Skilled_Agent(Agent):
-    def pick_friends(self, levels, cap, skill_levels=None):
+    def pick_friends(self, levels, cap, skill_levels=None, skill_order=None):
         assert (skill_levels.all() != None)
 
         # Method 1 - pick most skilled agent that is not currently ahead in levels, else pick least levelled
-        candidates_levels = list(zip([i for i in range(len(levels))], levels))
-        self_level = candidates_levels.pop(self.id)[1]
-        # print("current level"+str(self_level))
-        candidates_levels = sorted(candidates_levels, key=lambda t: t[1])
-
-        candidates_skills = list(zip([j for j in range(len(skill_levels))], skill_levels))
-        self_skill = candidates_skills.pop(self.id)[1]
-        candidates_skills = sorted(candidates_skills, key=lambda t: t[1])
-
-        for i in range(len(skill_levels) - 1):
-            check = candidates_skills[len(skill_levels) - 2 - i][0]
-            # print("check " + str(i)+ " other guy " + str(check)+ " skill = " +str(skill_levels[check])+" level = " + str(levels[check]))
-            # possible idea:
-            # k = (skill_levels[check] - self_skill)*10
-            k = cap/10
-            if levels[check] + k <= self_level:
-                return check
-
-        return candidates_levels[0][0]
+        skill_levels = np.asarray(skill_levels)
+
+        # All agents from most to least skilled (ties go to the higher index)
+        if skill_order is None:
+            skill_order = np.argsort(skill_levels, kind='stable')[::-1]
+
+        # possible idea:
+        # k = (skill_levels[check] - skill_levels[self.id])*10
+        k = cap/10
+        return int(kernels.strategic_pick(self.id, levels, skill_order, k))
 
     def accept_reward(self, reward, done=False, levels=None, cap=None):
         pass
@@ -171,40 +184,47 @@ class Strategic_Skilled_Agent(Agent):
 
 
 class Beta_Binomial_Agent(Strategic_Skilled_Agent):
-    def __init__(self, id, level, skill, priors=(1, 1)):
-        super(Beta_Binomial_Agent, self).__init__(id, level)
+    def __init__(self, id, level, skill, priors=(1, 1), seed=None):
+        super(Beta_Binomial_Agent, self).__init__(id, level, seed)
         self.skill = skill
-        self.trials = {}
-        self.successes = {}
+        # Per-player counts, sized once the number of players is known
+        self.trials = None
+        self.successes = None
         self.last_friend = None
         self.last_friend_level = None
         self.last_level = level
         self.priors = priors
+        self._probs_buf = None
+
+    def map_probs(self, num_players, out=None):
+        if self.trials is None:
+            self.trials = np.zeros(num_players, dtype=np.int64)
+            self.successes = np.zeros(num_players, dtype=np.int64)
 
-    def map_probs(self, num_players):
-        skill_levels_map = np.zeros(num_players)
-        for i in self.trials.keys():
-            prob_map = (self.successes[i] + self.priors[0]) / (self.trials[i] + self.priors[0] + self.priors[1])
-            skill_levels_map[i] = prob_map - self.skill
-        return skill_levels_map
+        # Fill the given buffer in place if there is one
+        if out is None:
+            out = np.empty(num_players)
+        out.fill(0.)
 
-    def pick_friends(self, levels, cap, skill_levels=None):
+        # Only players that have been picked before (never itself) get an estimate
+        tried = self.trials > 0
+        np.divide(self.successes + self.priors[0], self.trials + self.priors[0] + self.priors[1], out=out, where=tried)
+        np.subtract(out, self.skill, out=out, where=tried)
+        return out
+
+    def pick_friends(self, levels, cap, skill_levels=None, skill_order=None):
         if self.last_friend is not None and levels[self.last_friend] - self.last_friend_level > 0 and levels[self.id] - self.last_level > 0:
             self.successes[self.last_friend] += 1
 
-        # Calculate the max a posteriori estimate for each other player
-        skill_levels_map = self.map_probs(len(levels))
+        # Calculate the max a posteriori estimate for each other player, reusing the same buffer every round
+        if self._probs_buf is None or self._probs_buf.size != len(levels):
+            self._probs_buf = np.empty(len(levels))
+        skill_levels_map = self.map_probs(len(levels), out=self._probs_buf)
 
         # Use the skilled agent's algorithm for picking friend
         friend = super(Beta_Binomial_Agent, self).pick_friends(levels, cap, skill_levels=skill_levels_map)
 
-        if friend not in self.trials.keys():
-            self.trials[friend] = 1
-        else:
-            self.trials[friend] += 1
-
-        if friend not in self.successes.keys():
-            self.successes[friend] = 0
+        self.trials[friend] += 1
 
         self.last_friend = friend
         self.last_friend_level = levels[friend]
@@ -213,42 +233,49 @@ class Beta_Binomial_Agent(Strategic_Skilled_Agent):
         return friend
 
 class Gamma_Poisson_Agent(Strategic_Skilled_Agent):
-    def __init__(self, id, level, skill, priors=(1, 2)):
-        super(Gamma_Poisson_Agent, self).__init__(id, level)
+    def __init__(self, id, level, skill, priors=(1, 2), seed=None):
+        super(Gamma_Poisson_Agent, self).__init__(id, level, seed)
         self.skill = skill
-        self.trials = {}
-        self.successes = {}
+        # Per-player counts, sized once the number of players is known
+        self.trials = None
+        self.successes = None
         self.last_friend = None
         self.last_friend_level = None
         self.last_level = level
         self.priors = priors
-
-    def map_probs(self, num_players):
-        skill_levels_map = np.zeros(num_players)
-        for i in self.trials.keys():
-            r = self.priors[0] + self.successes[i]
-            p = 1 / (1 + self.priors[1] + self.trials[i])
-            prob_map = p * r / (1 - p)
-            skill_levels_map[i] = prob_map - self.skill
-        return skill_levels_map
-
-    def pick_friends(self, levels, cap, skill_levels=None):
+        self._probs_buf = None
+
+    def map_probs(self, num_players, out=None):
+        if self.trials is None:
+            self.trials = np.zeros(num_players, dtype=np.int64)
+            self.successes = np.zeros(num_players, dtype=np.int64)
+
+        # Fill the given buffer in place if there is one
+        if out is None:
+            out = np.empty(num_players)
+        out.fill(0.)
+
+        # Only players that have been picked before (never itself) get an estimate
+        tried = self.trials > 0
+        r = self.priors[0] + self.successes
+        p = 1 / (1 + self.priors[1] + self.trials)
+        np.divide(p * r, 1 - p, out=out, where=tried)
+        np.subtract(out, self.skill, out=out, where=tried)
+        return out
+
+    def pick_friends(self, levels, cap, skill_levels=None, skill_order=None):
         if self.last_friend is not None and levels[self.last_friend] - self.last_friend_level > 0 and levels[self.id] - self.last_level > 0:
             self.successes[self.last_friend] += 1
 
-        # Calculate the max a posteriori estimate for each other player
-        skill_levels_map = self.map_probs(len(levels))
+        # Calculate the max a posteriori estimate for each other player, reusing the same buffer every round
+        if self._probs_buf is None or self._probs_buf.size != len(levels):
+            self._probs_buf = np.empty(len(levels))
+        skill_levels_map = self.map_probs(len(levels), out=self._probs_buf)
 
         # Use the skilled agent's algorithm for picking friend
         friend = super(Gamma_Poisson_Agent, self).pick_friends(levels, cap, skill_levels=skill_levels_map)
 
-        if friend not in self.trials.keys():
-            self.trials[friend] = 1
-        else:
-            self.trials[friend] += 1
-
-        if friend not in self.successes.keys():
-            self.successes[friend] = 0
+        self.trials[friend] += 1
 
         self.last_friend = friend
         self.last_friend_level = levels[friend]
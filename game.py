@@ -1,9 +1,13 @@
 import logging
 import numpy as np
 
+import agents
+import kernels
+import mechanisms
+
 
 class Game(object):
-    def __init__(self, players, mechanism, cap, reward_type='WINNERTAKEALL', logging_level='DEBUG'):
+    def __init__(self, players, mechanism, cap, reward_type='WINNERTAKEALL', logging_level='DEBUG', seed=None):
         """
         Given all the configurable settings, including players, mechanism, cap, create the game
 
@@ -19,7 +23,12 @@ class Game(object):
             Type of reward to give when game ends
         logging_level : str
             How much text to be outputted by the game
+        seed : int
+            The seed for the game's own random number generator, also used by the mechanism (optional)
         """
+        if len(players) < 3:
+            raise ValueError(f'Not enough players, need at least 3 but got {len(players)}')
+
         logging.basicConfig(
             level=logging_level,
             filename='game.log',
@@ -29,20 +38,26 @@ class Game(object):
 
         self.num_players = len(players)
 
-        logging.info(f'{self.num_players} currently playing.')
-        logging.info(f'Players: {[str(player) for player in players]}')
-
-        if self.num_players < 3:
-            logging.critical("Not enough players.")
-            print("Not enough players.")
-            return
+        logging.info('%d currently playing.', self.num_players)
+        if logging.getLogger().isEnabledFor(logging.INFO):
+            logging.info('Players: %s', [str(player) for player in players])
 
         # Initialize all levels to 0
-        self.levels = [0 for i in range(self.num_players)]
+        self.levels = np.zeros(self.num_players, dtype=np.int32)
         self.players = players
 
+        # The ids of the players in list order, so per-player values can be gathered in one array operation
+        self._player_ids = np.array([player.id for player in players], dtype=np.intp)
+
+        # The game and its mechanism draw from their own generator rather than the global one
+        self.rng = np.random.default_rng(seed)
+        mechanism.set_rng(self.rng)
+
         # Randomly initialize the index of the player that starts king
-        self.king = np.random.randint(0, self.num_players)
+        self.king = int(self.rng.integers(0, self.num_players))
+
+        # The kingship always passes to the next player, so look it up instead of taking a modulo every round
+        self._next_king = [(i + 1) % self.num_players for i in range(self.num_players)]
 
         self.mechanism = mechanism
         self.cap = cap
@@ -52,25 +67,25 @@ class Game(object):
         self.lose_reward = float(-self.cap)
         self.win_reward = 1.0
 
+        # Indexed by whether each player reached the cap, so the end of game rewards are one lookup
+        self._outcome_rewards = np.array([self.lose_reward, self.win_reward])
+
     def _is_game_over(self, levels):
         """
         Check if the game should finish
 
         Parameters
         ----------
-        levels : list(int)
+        levels : np.ndarray(int)
             The levels that the agents are currently on
 
         Returns
         -------
         True/False for if the game is over
         """
-        for level in levels:
-            if level >= self.cap:
-                return True
-        return False
+        return bool(levels.max() >= self.cap)
 
-    def reward(self, player, old_levels, new_levels):
+    def reward(self, player, old_level, new_levels, done=None):
         """
         Calculate the reward to give to each agent based on current levels
 
@@ -78,37 +93,45 @@ class Game(object):
         ----------
         player : Agent
             The agent whose action resulted in these new levels
-        new_levels : list(int)
+        old_level : int
+            The level of that agent before its action
+        new_levels : np.ndarray(int)
             The most recent levels that the agents are on
+        done : bool
+            Whether the game is over, checked against all levels if not given
+
+        Returns
+        -------
+        True/False for if the game is over
         """
-        if self._is_game_over(new_levels):
+        if done is None:
+            done = self._is_game_over(new_levels)
+        if done:
             # If game is over, assign win and lose rewards to each agent
             if self.reward_type == "WINNERTAKEALL":
-                for p in self.players:
-                    if new_levels[p.id] >= self.cap:
-                        p.accept_reward(float(self.win_reward), done=True)
-                    else:
-                        p.accept_reward(float(self.lose_reward), done=True)
+                rewards = self._outcome_rewards[(new_levels >= self.cap)[self._player_ids].view(np.int8)]
+                for p, r in zip(self.players, rewards.tolist()):
+                    p.accept_reward(r, done=True)
             elif self.reward_type == "PROPORTIONAL":
-                sum_levels = sum(new_levels)
-                for p in self.players:
-                    p.accept_reward(float(new_levels[p.id]/sum_levels), done=True)
+                rewards = (new_levels / new_levels.sum())[self._player_ids]
+                for p, r in zip(self.players, rewards.tolist()):
+                    p.accept_reward(r, done=True)
             elif self.reward_type == "RANKED":
                 # Start with num_players points, lose 1 for every player ranked above
-                for p in self.players:
-                    curr_reward = self.num_players
-                    for q in self.players:
-                        if new_levels[q.id] > new_levels[p.id]:
-                            curr_reward -= 1
-                    p.accept_reward(float(curr_reward), done=True)
+                rewards = self.num_players - (new_levels[None, :] > new_levels[:, None]).sum(axis=1)
+                for p, r in zip(self.players, rewards[self._player_ids].tolist()):
+                    p.accept_reward(float(r), done=True)
 
         else:
             # If game is not over, assign reward and continue
-            # print(float(new_levels[player.id] - old_levels[player.id]))
+            # The levels keep changing in place for the rest of the game, so the agent gets its own copy to keep as state
+            # print(float(new_levels[player.id] - old_level))
             if self.reward_type == "WINNERTAKEALL":
-                player.accept_reward(float(new_levels[player.id] - old_levels[player.id]), done=False, levels=new_levels, cap=self.cap)
+                player.accept_reward(float(new_levels[player.id] - old_level), done=False, levels=new_levels.copy(), cap=self.cap)
             else:
-                player.accept_reward(0., done=False, levels=new_levels, cap=self.cap)
+                player.accept_reward(0., done=False, levels=new_levels.copy(), cap=self.cap)
+
+        return done
 
 
     def play(self):
@@ -116,26 +139,39 @@ class Game(object):
         Play the game in its entirety
         """
         logging.info('Game starting!')
+
+        # Check the logging level once so quiet games skip the per-round logging entirely
+        log_rounds = logging.getLogger().isEnabledFor(logging.DEBUG)
+
         round = 0
-        while not self._is_game_over(self.levels):
+        done = self._is_game_over(self.levels)
+        while not done:
             round += 1
-            logging.debug(f'Round {round}: Current Levels {self.levels}, Current King {self.king}')
+            if log_rounds:
+                logging.debug('Round %d: Current Levels %s, Current King %d', round, self.levels, self.king)
 
-            # The mechanism is used to determine the new levels of all players
-            new_levels = self.mechanism.play(self.king , self.players, self.levels, self.cap)
+            # The mechanism may update the levels in place, so the king's level from before the round is kept for its reward
+            player = self.players[self.king]
+            old_level = int(self.levels[player.id])
+            self.levels = self.mechanism.play(self.king, self.players, self.levels, self.cap)
 
-            # The rewards are distributed based on these new levels
-            self.reward(self.players[self.king], self.levels, new_levels)
+            # Only the king and friend can have leveled up, so they are the only ones that can have ended the game
+            friend = self.mechanism.last_friend
+            if friend is None:
+                done = self._is_game_over(self.levels)
+            else:
+                done = bool(self.levels[self.king] >= self.cap or self.levels[friend] >= self.cap)
 
-            # New levels are assigned after rewards are computed
-            self.levels = new_levels
+            # The rewards are distributed based on these new levels
+            self.reward(player, old_level, self.levels, done=done)
 
             # The kingship moves forward
-            self.king  = (self.king + 1) % self.num_players
+            self.king = self._next_king[self.king]
 
-        logging.info('Game results:')
-        for i in range(self.num_players):
-            logging.info(f'Player {i}: {self.players[i]}, Level {self.levels[i]}')
+        if logging.getLogger().isEnabledFor(logging.INFO):
+            logging.info('Game results:')
+            for i in range(self.num_players):
+                logging.info('Player %d: %s, Level %d', i, self.players[i], self.levels[i])
 
     # def step(self, friend):
     #     if not self._is_game_over(self.levels):
@@ -165,5 +201,127 @@ class Game(object):
         """
         Reset all the variables so the game can start over
         """
-        self.levels = [0 for i in range(self.num_players)]
-        self.king = np.random.randint(0, self.num_players)
\ No newline at end of file
+        # Allocate fresh levels rather than zeroing in place, since callers may keep the finished game's levels
+        self.levels = np.zeros(self.num_players, dtype=np.int32)
+        self.king = int(self.rng.integers(0, self.num_players))
+
+
+def _batch_basic_friends(levels, king, rng):
+    # Randomly pick an agent that is not the king (excluded when sampling)
+    num_games, num_players = levels.shape
+    return (rng.integers(1, num_players, size=num_games) + king) % num_players
+
+
+def _batch_lowest_friends(levels, king, rng):
+    # Pick the agent besides the king that has the lowest level, breaking ties uniformly at random
+    rows = np.arange(levels.shape[0])
+    candidates_levels = levels.astype(np.float64)
+    candidates_levels[rows, king] = np.inf
+    lowest = candidates_levels == candidates_levels.min(axis=1)[:, None]
+    return np.where(lowest, rng.random(levels.shape), -1.).argmax(axis=1)
+
+
+def _batch_strategic_friends(levels, king, cap, skill_order):
+    # Pick the most skilled agent that is not currently ahead of the king, else the least levelled
+    rows = np.arange(levels.shape[0])
+    eligible = (levels[:, skill_order] + cap/10 <= levels[rows, king][:, None]) & (skill_order[None, :] != king[:, None])
+
+    candidates_levels = levels.astype(np.float64)
+    candidates_levels[rows, king] = np.inf
+    return np.where(eligible.any(axis=1), skill_order[eligible.argmax(axis=1)], candidates_levels.argmin(axis=1))
+
+
+def play_batch(players, mechanism, cap, num_games, seed=None):
+    """
+    Play many independent games in lockstep, one round of every game per step, for Monte-Carlo evaluation
+
+    Only the scripted agents are supported (Basic_Agent, Lowest_Level_Agent and Strategic_Skilled_Agent), since
+    their policies can be computed for every game at once. No rewards are handed out.
+
+    Parameters
+    ----------
+    players : list(Agent)
+        The agents whose policies are played, indexed by id
+    mechanism : Mechanism
+        The Baseline, Skill or Sabotage mechanism with sample_bernoulli or sample_poisson
+    cap : int
+        The maximum level that signals end of game
+    num_games : int
+        The number of games to play
+    seed : int
+        The seed for the random number generator (optional). Games of only Basic_Agent players under the
+        Bernoulli baseline are played by a different kernel when Numba is installed, so their seeded results
+        depend on whether Numba is installed
+
+    Returns
+    -------
+    The (num_games, num_players) final levels of every game
+    """
+    num_players = len(players)
+    rng = np.random.default_rng(seed)
+
+    # The kings and friends of each game are positions in the players list, so the ids have to match them
+    if [player.id for player in players] != list(range(num_players)):
+        raise ValueError('Batched play requires players ordered by id, with ids 0 to num_players - 1')
+
+    policies = []
+    for player in players:
+        if type(player) not in (agents.Basic_Agent, agents.Lowest_Level_Agent, agents.Strategic_Skilled_Agent):
+            raise ValueError(f'{player.__class__.__name__} cannot be played in a batch')
+        policies.append(type(player))
+    policies = np.array(policies)
+
+    if isinstance(mechanism, mechanisms.Baseline_Mechanism):
+        skill_levels = None
+    elif isinstance(mechanism, (mechanisms.Skill_Mechanism, mechanisms.Sabotage_Mechanism)):
+        # None of the scripted agents sabotage, so the sabotage mechanism plays like the skill mechanism
+        skill_levels = mechanism.skill_arr
+        skill_total = skill_levels.sum()
+        skill_order = mechanism.skill_order
+    else:
+        raise ValueError(f'{mechanism.__class__.__name__} cannot be played in a batch')
+
+    if skill_levels is None and agents.Strategic_Skilled_Agent in policies:
+        raise ValueError('Strategic_Skilled_Agent requires a mechanism with skill levels')
+
+    # Games of only Basic_Agent players under the Bernoulli baseline have no state besides the levels,
+    # so with Numba each one is played start to finish in compiled code
+    if (kernels.NUMBA_AVAILABLE and skill_levels is None and mechanism.sample is mechanisms.sample_bernoulli
+            and all(policy is agents.Basic_Agent for policy in policies)):
+        return kernels.simulate_baseline(num_players, mechanism.p, cap, num_games, rng)
+
+    if mechanism.sample is mechanisms.sample_bernoulli:
+        sample = lambda p: (rng.random(num_games) < p).astype(np.int32)
+    elif mechanism.sample is mechanisms.sample_poisson:
+        sample = lambda p: rng.poisson(p, size=num_games).astype(np.int32)
+    else:
+        raise ValueError('Batched play only supports sample_bernoulli and sample_poisson')
+
+    levels = np.zeros((num_games, num_players), dtype=np.int32)
+    king = rng.integers(0, num_players, size=num_games)
+    done = np.zeros(num_games, dtype=bool)
+
+    while not done.all():
+        # Each game's king picks a friend with its own policy
+        friend = np.empty(num_games, dtype=np.int64)
+        king_policies = policies[king]
+        for policy in set(policies):
+            games = king_policies == policy
+            if policy is agents.Basic_Agent:
+                friend[games] = _batch_basic_friends(levels[games], king[games], rng)
+            elif policy is agents.Lowest_Level_Agent:
+                friend[games] = _batch_lowest_friends(levels[games], king[games], rng)
+            else:
+                friend[games] = _batch_strategic_friends(levels[games], king[games], cap, skill_order)
+
+        if skill_levels is None:
+            increase = sample(mechanism.p)
+        else:
+            increase = sample((skill_levels[king] + skill_levels[friend]) / skill_total)
+
+        kernels.advance_games(levels, king, friend, increase, cap, done)
+
+        # The kingship moves forward
+        king = (king + 1) % num_players
+
+    return levels
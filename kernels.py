@@ -0,0 +1,175 @@
+import numpy as np
+
+# Numba is optional, every kernel besides simulate_baseline has a NumPy fallback with the same signature
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, cache=True)
+    def advance_games(levels, king, friend, increase, cap, done):
+        for g in prange(levels.shape[0]):
+            if not done[g]:
+                levels[g, king[g]] += increase[g]
+                levels[g, friend[g]] += increase[g]
+                done[g] = levels[g, king[g]] >= cap or levels[g, friend[g]] >= cap
+
+else:
+    def advance_games(levels, king, friend, increase, cap, done):
+        rows = np.arange(levels.shape[0])
+        increase = np.where(done, 0, increase)
+        levels[rows, king] += increase
+        levels[rows, friend] += increase
+        done |= (levels[rows, king] >= cap) | (levels[rows, friend] >= cap)
+
+advance_games.__doc__ = """
+    Apply one round to many independent games at once, in place
+
+    Parameters
+    ----------
+    levels : np.ndarray(int)
+        The (num_games, num_players) levels of every game
+    king : np.ndarray(int)
+        The king of each game this round
+    friend : np.ndarray(int)
+        The friend picked by each king
+    increase : np.ndarray(int)
+        How many levels each kingship goes up by
+    cap : int
+        The max level cap
+    done : np.ndarray(bool)
+        Which games are already over, updated with the games that finish this round
+    """
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def strategic_pick(self_id, levels, order, k):
+        # One pass that also tracks the lowest levelled player (lowest id on ties) as the fallback
+        fallback = -1
+        for i in range(order.shape[0]):
+            idx = order[i]
+            if idx == self_id:
+                continue
+            if levels[idx] + k <= levels[self_id]:
+                return idx
+            if fallback == -1 or levels[idx] < levels[fallback] or (levels[idx] == levels[fallback] and idx < fallback):
+                fallback = idx
+        return fallback
+
+else:
+    def strategic_pick(self_id, levels, order, k):
+        order = order[order != self_id]
+        order_levels = levels[order]
+        eligible = order_levels + k <= levels[self_id]
+        if eligible.any():
+            return order[eligible.argmax()]
+        return order[order_levels == order_levels.min()].min()
+
+strategic_pick.__doc__ = """
+    Pick the most skilled player that is not k or more levels ahead of the king, else the lowest levelled one
+
+    Parameters
+    ----------
+    self_id : int
+        The id of the king picking a friend
+    levels : np.ndarray(int)
+        The levels of all players
+    order : np.ndarray(int)
+        The ids of all players from most to least skilled, which may include the king
+    k : float
+        How many levels below the king a friend has to be
+
+    Returns
+    -------
+    The id of the friend
+    """
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def lowest_pick(levels, others, u):
+        # First pass finds the lowest level and how many players share it
+        lowest = levels[others[0]]
+        ties = 0
+        for i in others:
+            if levels[i] < lowest:
+                lowest = levels[i]
+                ties = 1
+            elif levels[i] == lowest:
+                ties += 1
+
+        # Second pass returns the chosen one of the tied players
+        chosen = int(u * ties)
+        for i in others:
+            if levels[i] == lowest:
+                if chosen == 0:
+                    return i
+                chosen -= 1
+        return -1
+
+else:
+    def lowest_pick(levels, others, u):
+        others_levels = levels[others]
+        lowest = others[others_levels == others_levels.min()]
+        return lowest[int(u * lowest.size)]
+
+lowest_pick.__doc__ = """
+    Pick the lowest levelled player besides the king, breaking ties uniformly at random
+
+    Parameters
+    ----------
+    levels : np.ndarray(int)
+        The levels of all players
+    others : np.ndarray(int)
+        The ids of every player besides the king
+    u : float
+        A uniform draw in [0, 1) used to break ties
+
+    Returns
+    -------
+    The id of the friend
+    """
+
+
+# Playing whole games is only worth it compiled, so this kernel has no fallback and is only defined with Numba
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def simulate_baseline(num_players, p, cap, num_games, rng):
+        """
+        Play whole games of Basic_Agent players under the baseline mechanism with Bernoulli draws
+
+        Parameters
+        ----------
+        num_players : int
+            The number of players in each game
+        p : float
+            The probability of the kingship leveling up
+        cap : int
+            The max level cap
+        num_games : int
+            The number of games to play
+        rng : np.random.Generator
+            The generator to draw from
+
+        Returns
+        -------
+        The (num_games, num_players) final levels of every game
+        """
+        results = np.zeros((num_games, num_players), dtype=np.int32)
+        for g in range(num_games):
+            levels = results[g]
+            king = rng.integers(0, num_players)
+            while True:
+                # Randomly pick a friend that is not the king, then level up both with probability p
+                friend = (king + rng.integers(1, num_players)) % num_players
+                if rng.random() < p:
+                    levels[king] += 1
+                    levels[friend] += 1
+                    if levels[king] >= cap or levels[friend] >= cap:
+                        break
+                king = (king + 1) % num_players
+        return results
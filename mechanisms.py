@@ -13,10 +13,59 @@ class Mechanism(object):
         ----------
         num_players : int
             The number of players in this mechanism
+        sample : func
+            The function for determining if and how many levels to increase the kingship by, given p and a generator
         """
         self.num_players = num_players
         self.sample = sample
 
+        # The generator that all draws come from, replaced through set_rng by the game's own generator
+        self.rng = np.random.default_rng()
+
+        # The friend picked in the latest round, since only the king and friend can level up
+        self.last_friend = None
+
+        # Uniform draws for sample_bernoulli are made in bulk, since every NumPy call has a fixed overhead
+        self._u_size = 4096
+        self._u_buf = []
+        self._u_idx = 0
+
+    def set_rng(self, rng):
+        """
+        Draw from the given generator from now on, discarding any uniforms buffered from the previous one
+
+        Parameters
+        ----------
+        rng : np.random.Generator
+            The generator that all draws come from
+        """
+        self.rng = rng
+        self._u_buf = []
+        self._u_idx = 0
+
+    def _draw(self, p):
+        """
+        Sample how many levels to increase the kingship by, handing out buffered uniform draws for sample_bernoulli
+
+        Parameters
+        ----------
+        p : float
+            The parameter of the sample function
+
+        Returns
+        -------
+        The number of levels to increase the kingship by
+        """
+        if self.sample is not sample_bernoulli:
+            return self.sample(p, self.rng)
+
+        if self._u_idx == len(self._u_buf):
+            self._u_buf = self.rng.random(self._u_size).tolist()
+            self._u_idx = 0
+        u = self._u_buf[self._u_idx]
+        self._u_idx += 1
+        return 1 if u < p else 0
+
     def rotate_levels(self, levels, n):
         """
         Rotate the levels so that index n becomes index 0, for ease of feeding to agents
@@ -25,16 +74,16 @@ class Mechanism(object):
 
         Parameters
         ----------
-        levels : list(int)
+        levels : np.ndarray(int)
             The levels of all players by original index
         n : int
             The index to shift by, can be positive or negative
 
         Returns
         -------
-        A rotated list of levels with index n at index 0
+        A rotated array of levels with index n at index 0
         """
-        return levels[n:] + levels[:n]
+        return np.concatenate((levels[n:], levels[:n]))
 
     @abstractmethod
     def play(self, king, players, levels, cap):
@@ -47,8 +96,8 @@ class Mechanism(object):
             The index of the player whose turn it is to perform an action
         players : list(Agent)
             The players currently in the game
-        levels : list(int)
-            The levels of all players currently
+        levels : np.ndarray(int)
+            The levels of all players currently, which are updated in place
         cap : int
             The max level cap
         sample: func
@@ -56,7 +105,9 @@ class Mechanism(object):
 
         Returns
         -------
-        The new levels that result from the player's action and the mechanism's logic
+        The levels after the player's action and the mechanism's logic, which is the same array that was passed in.
+        The friend that was picked should also be stored in self.last_friend, which lets the game check only the king
+        and friend for the end of game (the game checks every level if it is left as None)
         '''
         pass
 
@@ -92,7 +143,6 @@ class Baseline_Mechanism(Mechanism):
         self.p = p
 
     def play(self, king, players, levels, cap):
-        new_levels = levels.copy()
         player = players[king]
 
         # Let the player who is king pick the friend
@@ -100,11 +150,12 @@ class Baseline_Mechanism(Mechanism):
         assert(friend != player.id)
 
         # Sample and increase levels
-        increase = self.sample(self.p)
-        new_levels[king] += increase
-        new_levels[friend] += increase
+        increase = self._draw(self.p)
+        levels[king] += increase
+        levels[friend] += increase
+        self.last_friend = friend
 
-        return new_levels
+        return levels
 
     # def step(self, levels, king, friend):
     #     new_levels = levels.copy()
@@ -138,23 +189,38 @@ class Skill_Mechanism(Mechanism):
         super(Skill_Mechanism, self).__init__(num_players, sample)
         self.skill_levels = skill_levels
 
-    def play(self, king, players, levels, cap):
-        new_levels = levels.copy()
+        # Skill levels are fixed, so the players only need to be ranked by skill once (ties go to the higher index)
+        self.skill_order = np.argsort(skill_levels, kind='stable')[::-1]
+
+        # Likewise the total skill used to normalize the probability of leveling up only needs to be summed once
+        self.skill_arr = np.asarray(skill_levels, dtype=np.float64)
+        self._skill_total = float(self.skill_arr.sum())
+
+        # With few players the probability of every pair fits in a small table, so a round only needs a lookup
+        if len(self.skill_arr) <= 16:
+            self._p_table = ((self.skill_arr[:, None] + self.skill_arr[None, :]) / self._skill_total).tolist()
+        else:
+            self._p_table = None
 
+    def play(self, king, players, levels, cap):
         player = players[king]
 
         # Let the player who is king pick the friend, accounting for skill levels now
-        friend = player.pick_friends(levels, cap, self.skill_levels)
+        friend = player.pick_friends(levels, cap, self.skill_levels, skill_order=self.skill_order)
 
         # The probability of leveling up is proportional to the sum of the skills of the players in the kingship
-        p = (self.skill_levels[player.id] + self.skill_levels[friend]) / np.sum(self.skill_levels)
+        if self._p_table is not None:
+            p = self._p_table[player.id][friend]
+        else:
+            p = (self.skill_arr[player.id] + self.skill_arr[friend]) / self._skill_total
 
         # Sample and increase levels
-        increase = self.sample(p)
-        new_levels[king] += increase
-        new_levels[friend] += increase
+        increase = self._draw(p)
+        levels[king] += increase
+        levels[friend] += increase
+        self.last_friend = friend
 
-        return new_levels
+        return levels
 
     # def step(self, levels, king, friend):
     #     new_levels = levels.copy()
@@ -191,28 +257,46 @@ class Sabotage_Mechanism(Mechanism):
         super(Sabotage_Mechanism, self).__init__(num_players, sample)
         self.skill_levels = skill_levels
 
+        # Skill levels are fixed, so the players only need to be ranked by skill once (ties go to the higher index)
+        self.skill_order = np.argsort(skill_levels, kind='stable')[::-1]
+
+        # Likewise the total skill used to normalize the probability of leveling up only needs to be summed once
+        self.skill_arr = np.asarray(skill_levels, dtype=np.float64)
+        self._skill_total = float(self.skill_arr.sum())
+
+        # The denominator when a friend sabotages is the total skill without that friend
+        self._denom_if_sabotaged = self._skill_total - self.skill_arr
+
+        # With few players the probability of every pair fits in a small table, so a round only needs a lookup
+        if len(self.skill_arr) <= 16:
+            self._p_table = ((self.skill_arr[:, None] + self.skill_arr[None, :]) / self._skill_total).tolist()
+        else:
+            self._p_table = None
+
     def play(self, king, players, levels, cap):
-        new_levels = levels.copy()
         player = players[king]
 
         # Let the player who is king pick the friend, accounting for skill levels now
-        friend = player.pick_friends(levels, cap, self.skill_levels)
+        friend = player.pick_friends(levels, cap, self.skill_levels, skill_order=self.skill_order)
 
         sabotage = players[friend].decide_sabotage(king, levels, cap, self.skill_levels)
 
         # The probability of leveling up is proportional to the sum of the skills of the players in the kingship
         if sabotage:
             # If the friend chooses to sabotage, then their skill level isn't contributed
-            p = self.skill_levels[player.id] / (np.sum(self.skill_levels) - self.skill_levels[friend])
+            p = self.skill_arr[player.id] / self._denom_if_sabotaged[friend]
+        elif self._p_table is not None:
+            p = self._p_table[player.id][friend]
         else:
-            p = (self.skill_levels[player.id] + self.skill_levels[friend]) / np.sum(self.skill_levels)
+            p = (self.skill_arr[player.id] + self.skill_arr[friend]) / self._skill_total
 
         # Sample and increase levels
-        increase = self.sample(p)
-        new_levels[king] += increase
-        new_levels[friend] += increase
+        increase = self._draw(p)
+        levels[king] += increase
+        levels[friend] += increase
+        self.last_friend = friend
 
-        return new_levels
+        return levels
 
     # def step(self, levels, king, friend):
     #     p = (self.skill_levels[king] + self.skill_levels[friend]) / np.sum(self.skill_levels)
@@ -232,11 +316,11 @@ class Sabotage_Mechanism(Mechanism):
         return self.num_players - 1
 
 
-def sample_bernoulli(p):
-    if np.random.random() < p:
+def sample_bernoulli(p, rng=np.random):
+    if rng.random() < p:
         return 1
     else:
         return 0
 
-def sample_poisson(p):
-    return np.random.poisson(p)
\ No newline at end of file
+def sample_poisson(p, rng=np.random):
+    return rng.poisson(p)
\ No newline at end of file
@@ -0,0 +1,93 @@
+import numpy as np
+
+# Ray is optional, it is only needed to play games in parallel
+try:
+    import ray
+    RAY_AVAILABLE = True
+except ImportError:
+    RAY_AVAILABLE = False
+
+
+class GameActor(object):
+    def __init__(self, make_game, seed):
+        """
+        Holds one game and plays it repeatedly, meant to be run as a Ray actor on its own core
+
+        Parameters
+        ----------
+        make_game : func
+            Builds the Game given a seed, called inside the actor so players (and any networks) are never pickled.
+            The seed can be handed straight to Game(seed=...) and spawned further for the agents
+        seed : np.random.SeedSequence
+            The seed handed to make_game
+        """
+        self.game = make_game(seed)
+
+    def play(self, num_games):
+        """
+        Play several games back to back, so each remote call amortizes its overhead over many games
+
+        Parameters
+        ----------
+        num_games : int
+            The number of games to play
+
+        Returns
+        -------
+        The (num_games, num_players) final levels of every game
+        """
+        results = np.empty((num_games, self.game.num_players), dtype=np.int32)
+        for i in range(num_games):
+            self.game.play()
+            results[i] = self.game.levels
+            self.game.reset()
+        return results
+
+
+def play_parallel(make_game, num_games, num_actors, games_per_call=100, seed=None):
+    """
+    Play many independent games spread across Ray actors
+
+    Parameters
+    ----------
+    make_game : func
+        Builds the Game given a seed, where the seeds of the actors are spawned from one SeedSequence
+    num_games : int
+        The number of games to play in total
+    num_actors : int
+        The number of actors (and so cores) to play on
+    games_per_call : int
+        How many games an actor plays per remote call
+    seed : int
+        The seed that all actor seeds are spawned from (optional)
+
+    Returns
+    -------
+    The (num_games, num_players) final levels of every game
+    """
+    if not RAY_AVAILABLE:
+        raise ImportError('play_parallel requires ray to be installed')
+
+    # Without at least one actor and one game per call, the games would never all be submitted
+    if num_actors <= 0:
+        raise ValueError(f'num_actors must be positive, got {num_actors}')
+    if games_per_call <= 0:
+        raise ValueError(f'games_per_call must be positive, got {games_per_call}')
+    if num_games <= 0:
+        raise ValueError(f'num_games must be positive, got {num_games}')
+
+    remote_actor = ray.remote(GameActor)
+    actors = [remote_actor.remote(make_game, s) for s in np.random.SeedSequence(seed).spawn(num_actors)]
+
+    # Calls to the same actor run in order, so everything can be submitted up front
+    pending = []
+    remaining = num_games
+    while remaining > 0:
+        for actor in actors:
+            n = min(games_per_call, remaining)
+            if n == 0:
+                break
+            pending.append(actor.play.remote(n))
+            remaining -= n
+
+    return np.concatenate(ray.get(pending))